@@ -0,0 +1,42 @@
+"""
+Shared fixtures for the Mergington High School Activities API tests
+"""
+
+import copy
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi.testclient import TestClient
+
+from app import app, activities
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Create a single test client for the FastAPI app, shared by the session"""
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def aclient():
+    """Create a single async client for the FastAPI app, shared by the session"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        yield c
+
+
+@pytest.fixture(autouse=True)
+def reset_activities():
+    """Restore activities to their initial state after each test"""
+    # Snapshot the in-memory database so tests don't interfere with each other
+    snapshot = copy.deepcopy(activities)
+    yield
+    activities.clear()
+    activities.update(copy.deepcopy(snapshot))
+
+
+@pytest.fixture(scope="session")
+def activities_json(client):
+    """Fetch the initial activities once and cache the JSON for the session"""
+    return client.get("/activities").json()
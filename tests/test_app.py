@@ -1,32 +1,95 @@
 """
 Test suite for the Mergington High School Activities API
+
+Tests that change state issue all of their requests first and then verify
+the result with a single GET of /activities.
 """
 
+import asyncio
+import json
+from functools import lru_cache
+from urllib.parse import quote, unquote, urlencode
+
 import pytest
-from fastapi.testclient import TestClient
-from pathlib import Path
-import sys
 
-# Add src directory to path so we can import app
-sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from app import app, activities
 
-from app import app
+EXPECTED_ACTIVITIES = frozenset({
+    "Basketball Team",
+    "Soccer Club",
+    "Art Club",
+    "Drama Club",
+    "Debate Team",
+    "Math Club",
+    "Chess Club",
+    "Programming Class",
+    "Gym Class",
+})
 
+REQUIRED_FIELDS = ["description", "schedule", "max_participants", "participants"]
 
-@pytest.fixture
-def client():
-    """Create a test client for the FastAPI app"""
-    return TestClient(app)
+EXPECTED_SIGNUP_MSG = "Signed up {email} for {activity}".format
+EXPECTED_UNREG_MSG = "Unregistered {email} from {activity}".format
+
+
+@lru_cache(maxsize=None)
+def activity_url(activity):
+    """Return the URL-encoded path prefix for an activity"""
+    return f"/activities/{quote(activity, safe='')}"
+
+
+def signup_url(activity):
+    """Return the signup path for an activity"""
+    return f"{activity_url(activity)}/signup"
+
+
+def unregister_url(activity, email):
+    """Return the path for removing a participant from an activity"""
+    return f"{activity_url(activity)}/participants/{quote(email, safe='')}"
+
+
+async def asgi_call(app, method, path, params=None):
+    """Call the ASGI app directly and return the response (status, body)"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": unquote(path),
+        "raw_path": path.encode(),
+        "query_string": urlencode(params or {}).encode(),
+        "root_path": "",
+        "headers": [(b"host", b"test")],
+        "client": ("test", 50000),
+        "server": ("test", 80),
+    }
+    pending = [{"type": "http.request", "body": b"", "more_body": False}]
+    status = None
+    body = []
+
+    async def receive():
+        if pending:
+            return pending.pop()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, b"".join(body)
 
 
 @pytest.fixture
-def reset_activities(client):
-    """Reset activities to initial state before each test"""
-    # This ensures tests don't interfere with each other
-    # by resetting the in-memory database
-    client.get("/activities")
-    yield
-    # Cleanup after test if needed
+def existing_participant():
+    """Return an (activity, email) pair that is currently registered"""
+    activity, email = "Chess Club", "michael@mergington.edu"
+    assert email in activities[activity]["participants"]
+    return activity, email
 
 
 class TestRootEndpoint:
@@ -42,63 +105,63 @@ class TestRootEndpoint:
 class TestActivitiesEndpoint:
     """Tests for the activities endpoint"""
     
-    def test_get_activities_success(self, client):
+    @pytest.mark.asyncio
+    async def test_get_activities_success(self):
         """Test retrieving all activities"""
-        response = client.get("/activities")
-        assert response.status_code == 200
-        data = response.json()
+        status, body = await asgi_call(app, "GET", "/activities")
+        assert status == 200
+        data = json.loads(body)
         assert isinstance(data, dict)
-        assert "Basketball Team" in data
-        assert "Soccer Club" in data
-        assert "Art Club" in data
-        assert "Drama Club" in data
-        assert "Debate Team" in data
-        assert "Math Club" in data
-        assert "Chess Club" in data
-        assert "Programming Class" in data
-        assert "Gym Class" in data
+        assert EXPECTED_ACTIVITIES <= data.keys()
     
-    def test_activities_have_required_fields(self, client):
-        """Test that each activity has required fields"""
-        response = client.get("/activities")
-        data = response.json()
-        
-        for activity_name, activity_data in data.items():
-            assert "description" in activity_data
-            assert "schedule" in activity_data
-            assert "max_participants" in activity_data
-            assert "participants" in activity_data
+    # Sorted so every xdist worker collects the cases in the same order
+    @pytest.mark.parametrize("name", sorted(EXPECTED_ACTIVITIES))
+    def test_activity_present(self, activities_json, name):
+        """Test that each expected activity is listed"""
+        assert name in activities_json
+    
+    @pytest.mark.parametrize("field", REQUIRED_FIELDS)
+    def test_activities_have_required_fields(self, activities_json, field):
+        """Test that each activity has the required field"""
+        for activity_name, activity_data in activities_json.items():
+            assert field in activity_data, activity_name
+    
+    def test_activities_participants_are_lists(self, activities_json):
+        """Test that participants of each activity are stored as a list"""
+        for activity_data in activities_json.values():
             assert isinstance(activity_data["participants"], list)
     
-    def test_activities_initial_participants(self, client):
+    def test_activities_initial_participants(self, activities_json):
         """Test that some activities have initial participants"""
-        response = client.get("/activities")
-        data = response.json()
+        participants = activities_json["Chess Club"]["participants"]
         
         # Chess Club should have initial participants
-        assert len(data["Chess Club"]["participants"]) == 2
-        assert "michael@mergington.edu" in data["Chess Club"]["participants"]
-        assert "daniel@mergington.edu" in data["Chess Club"]["participants"]
+        assert len(participants) == 2
+        assert "michael@mergington.edu" in participants
+        assert "daniel@mergington.edu" in participants
 
 
+@pytest.mark.xdist_group("mutates")
 class TestSignupEndpoint:
     """Tests for the signup endpoint"""
     
     def test_signup_success(self, client):
         """Test successful signup for an activity"""
         response = client.post(
-            "/activities/Basketball Team/signup",
+            signup_url("Basketball Team"),
             params={"email": "student@mergington.edu"}
         )
         assert response.status_code == 200
         data = response.json()
-        assert data["message"] == "Signed up student@mergington.edu for Basketball Team"
+        assert data["message"] == EXPECTED_SIGNUP_MSG(
+            email="student@mergington.edu", activity="Basketball Team"
+        )
     
     def test_signup_adds_to_participants(self, client):
         """Test that signup actually adds participant to activity"""
         # Signup a student
         client.post(
-            "/activities/Art Club/signup",
+            signup_url("Art Club"),
             params={"email": "artist@mergington.edu"}
         )
         
@@ -109,7 +172,7 @@ class TestSignupEndpoint:
     def test_signup_nonexistent_activity(self, client):
         """Test signup for activity that doesn't exist"""
         response = client.post(
-            "/activities/Nonexistent Activity/signup",
+            signup_url("Nonexistent Activity"),
             params={"email": "student@mergington.edu"}
         )
         assert response.status_code == 404
@@ -120,20 +183,17 @@ class TestSignupEndpoint:
         email = "duplicate@mergington.edu"
         activity = "Soccer Club"
         
-        # First signup should succeed
-        response1 = client.post(
-            f"/activities/{activity}/signup",
-            params={"email": email}
-        )
-        assert response1.status_code == 200
+        # Signups are sent in order; only the first should succeed
+        responses = [
+            client.post(signup_url(activity), params={"email": email})
+            for _ in range(2)
+        ]
+        assert [r.status_code for r in responses] == [200, 400]
+        assert "already signed up" in responses[1].json()["detail"]
         
-        # Second signup should fail
-        response2 = client.post(
-            f"/activities/{activity}/signup",
-            params={"email": email}
-        )
-        assert response2.status_code == 400
-        assert "already signed up" in response2.json()["detail"]
+        # Verify the student is registered only once
+        response = client.get("/activities")
+        assert response.json()[activity]["participants"].count(email) == 1
     
     def test_signup_multiple_students(self, client):
         """Test that multiple students can signup for the same activity"""
@@ -142,18 +202,18 @@ class TestSignupEndpoint:
         
         for email in students:
             response = client.post(
-                f"/activities/{activity}/signup",
+                signup_url(activity),
                 params={"email": email}
             )
             assert response.status_code == 200
         
         # Verify all students are registered
         response = client.get("/activities")
-        participants = response.json()[activity]["participants"]
-        for email in students:
-            assert email in participants
+        participants = set(response.json()[activity]["participants"])
+        assert set(students) <= participants
 
 
+@pytest.mark.xdist_group("mutates")
 class TestUnregisterEndpoint:
     """Tests for the unregister endpoint"""
     
@@ -164,16 +224,16 @@ class TestUnregisterEndpoint:
         
         # First signup
         client.post(
-            f"/activities/{activity}/signup",
+            signup_url(activity),
             params={"email": email}
         )
         
         # Then unregister
         response = client.delete(
-            f"/activities/{activity}/participants/{email}"
+            unregister_url(activity, email)
         )
         assert response.status_code == 200
-        assert response.json()["message"] == f"Unregistered {email} from {activity}"
+        assert response.json()["message"] == EXPECTED_UNREG_MSG(email=email, activity=activity)
     
     def test_unregister_removes_from_participants(self, client):
         """Test that unregister actually removes participant"""
@@ -182,13 +242,13 @@ class TestUnregisterEndpoint:
         
         # Signup first
         client.post(
-            f"/activities/{activity}/signup",
+            signup_url(activity),
             params={"email": email}
         )
         
         # Unregister
         client.delete(
-            f"/activities/{activity}/participants/{email}"
+            unregister_url(activity, email)
         )
         
         # Verify removal
@@ -198,7 +258,7 @@ class TestUnregisterEndpoint:
     def test_unregister_nonexistent_activity(self, client):
         """Test unregister from activity that doesn't exist"""
         response = client.delete(
-            "/activities/Nonexistent Activity/participants/student@test.com"
+            unregister_url("Nonexistent Activity", "student@test.com")
         )
         assert response.status_code == 404
         assert "Activity not found" in response.json()["detail"]
@@ -206,23 +266,18 @@ class TestUnregisterEndpoint:
     def test_unregister_not_registered_student(self, client):
         """Test unregistering a student who is not signed up"""
         response = client.delete(
-            "/activities/Basketball Team/participants/notregistered@test.com"
+            unregister_url("Basketball Team", "notregistered@test.com")
         )
         assert response.status_code == 400
         assert "not registered" in response.json()["detail"]
     
-    def test_unregister_existing_participant(self, client):
+    def test_unregister_existing_participant(self, client, existing_participant):
         """Test unregistering an existing participant"""
-        email = "michael@mergington.edu"
-        activity = "Chess Club"
-        
-        # Verify they're registered
-        response = client.get("/activities")
-        assert email in response.json()[activity]["participants"]
+        activity, email = existing_participant
         
         # Unregister
         response = client.delete(
-            f"/activities/{activity}/participants/{email}"
+            unregister_url(activity, email)
         )
         assert response.status_code == 200
         
@@ -231,41 +286,36 @@ class TestUnregisterEndpoint:
         assert email not in response.json()[activity]["participants"]
 
 
+@pytest.mark.xdist_group("mutates")
 class TestEdgeCases:
     """Tests for edge cases and boundary conditions"""
     
-    def test_activity_name_case_sensitivity(self, client):
-        """Test if activity names are case-sensitive"""
-        # Using different case
-        response = client.post(
-            "/activities/basketball team/signup",
-            params={"email": "test@test.com"}
-        )
-        # Should fail since activity names are case-sensitive
-        assert response.status_code == 404
+    @pytest.mark.parametrize(("activity", "email", "status"), [
+        # Activity names are case-sensitive
+        pytest.param("basketball team", "test@test.com", 404, id="case-sensitive-name"),
+        # Valid email containing special characters
+        pytest.param("Debate Team", "student+tag@mergington.edu", 200, id="special-char-email"),
+    ])
+    def test_signup_edge(self, client, activity, email, status):
+        """Test signup edge cases for activity names and emails"""
+        response = client.post(signup_url(activity), params={"email": email})
+        assert response.status_code == status
     
-    def test_email_with_special_characters(self, client):
-        """Test signup with valid email containing special characters"""
-        response = client.post(
-            "/activities/Debate Team/signup",
-            params={"email": "student+tag@mergington.edu"}
-        )
-        assert response.status_code == 200
-    
-    def test_multiple_signups_same_student_different_activities(self, client):
+    @pytest.mark.asyncio(loop_scope="session")
+    async def test_multiple_signups_same_student_different_activities(self, aclient):
         """Test that a student can signup for multiple different activities"""
         email = "multi@test.com"
-        activities = ["Basketball Team", "Art Club", "Chess Club"]
+        activity_names = ["Basketball Team", "Art Club", "Chess Club"]
         
-        for activity in activities:
-            response = client.post(
-                f"/activities/{activity}/signup",
-                params={"email": email}
-            )
+        responses = await asyncio.gather(*(
+            aclient.post(signup_url(activity), params={"email": email})
+            for activity in activity_names
+        ))
+        for response in responses:
             assert response.status_code == 200
         
         # Verify student is in all activities
-        response = client.get("/activities")
+        response = await aclient.get("/activities")
         data = response.json()
-        for activity in activities:
-            assert email in data[activity]["participants"]
+        joined = {name for name in activity_names if email in data[name]["participants"]}
+        assert joined == set(activity_names)